@@ -37,12 +37,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import re
+
 try:
-    from urllib.parse import parse_qs
-    from urllib.parse import urlparse
+    from urllib.parse import unquote_plus
 except ImportError:
-    from urlparse import parse_qs
-    from urlparse import urlparse
+    from urllib import unquote_plus
 
 from builtins import input
 
@@ -71,6 +71,8 @@ START_LNG = -122.466
 END_LAT = 37.7752315
 END_LNG = -122.418075
 
+SURGE_ID_PATTERN = re.compile(r'[?&]surge_confirmation_id=([^&#]+)')
+
 
 def estimate_ride(api_client):
     """Use an UberRidesClient to fetch a ride estimate and print the results.
@@ -219,9 +221,8 @@ def request_surge_ride(api_client, surge_confirmation_id=None):
         confirm_url = 'Copy the URL you are redirected to and paste here: \n'
         result = input(confirm_url).strip()
 
-        querystring = urlparse(result).query
-        query_params = parse_qs(querystring)
-        surge_id = query_params.get('surge_confirmation_id')[0]
+        match = SURGE_ID_PATTERN.search(result)
+        surge_id = unquote_plus(match.group(1)) if match else None
 
         # automatically try request again
         return request_surge_ride(api_client, surge_id)
@@ -32,34 +32,48 @@ To run this example:
         results to your terminal.
 """
 
-from __future__ import absolute_import
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
+import argparse
+import logging
+import sys
+import threading
 import time
 from collections import namedtuple
-
-try:
-    from urllib.parse import parse_qs
-    from urllib.parse import urlparse
-except ImportError:
-    from urlparse import parse_qs
-    from urlparse import urlparse
-
-from builtins import input
+from concurrent.futures import ThreadPoolExecutor
 
 from example.utils import create_uber_client
 from example.utils import fail_print
 from example.utils import import_oauth2_credentials
 from example.utils import paragraph_print
-from example.utils import success_print
 
 from uber_rides.errors import ClientError
 from uber_rides.errors import ServerError
-from geopy.geocoders import Nominatim
 
-from fcache.cache import FileCache
+import requests.models
+from diskcache import Cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger('uber-button')
+
+
+class _OrjsonCompat(object):
+    """Drop-in for the json module as used by requests, backed by orjson."""
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+
+# decode every API response with orjson's C parser when it is installed
+if orjson is not None:
+    requests.models.complexjson = _OrjsonCompat
 
 # Starting location
 START_NAME = "Lichtenbergstraße 6, Garching bei München"
@@ -67,6 +81,12 @@ START_NAME = "Lichtenbergstraße 6, Garching bei München"
 # End location
 END_NAME = "Moosacher Straße 86, München"
 
+# Coordinates of START_NAME and END_NAME, resolved once at startup
+START_COORDS = None
+END_COORDS = None
+
+UberLocation = namedtuple('UberLocation', 'latitude longitude')
+
 # uber pool
 UFP_PRODUCT_ID = '26546650-e557-4a7b-86e7-6a3942445247'
 UFP_PRODUCT_ID = 'bcb6224a-f21e-4cde-8e08-53cf9c98164d'
@@ -74,6 +94,55 @@ UFP_PRODUCT_ID = 'bcb6224a-f21e-4cde-8e08-53cf9c98164d'
 # uber black
 SURGE_PRODUCT_ID = 'd4abaae7-f4d6-4152-91cc-77523e8165a4'
 
+# in-process geocode results, backed by an on-disk result cache
+_LATLNG_MEM = {}
+_GEO_CACHE = Cache('uber-button-cache-dc')
+_GEO_CACHE_EXPIRE = 30 * 86400
+_MISSING = object()
+
+# Nominatim allows one request per second, keep a little margin
+GEOCODE_INTERVAL = 1.1
+
+# time.monotonic() of the last geocode sent to Nominatim, lookups may run
+# on several threads so it is only read and written under the lock
+_LAST_GEOCODE = None
+_LAST_GEOCODE_LOCK = threading.Lock()
+
+# one geocoder for the whole process so its requests.Session keeps the
+# connection to Nominatim alive between lookups, built on first cache miss
+GEOLOCATOR = None
+_GEOLOCATOR_LOCK = threading.Lock()
+
+
+def get_geolocator():
+    """Return the shared Nominatim geocoder, creating it on first use.
+
+    geopy is only imported here, so runs where every address is already
+    cached never pay for importing it.
+
+    Returns
+        (Nominatim)
+            The shared geocoder.
+    """
+    global GEOLOCATOR
+
+    with _GEOLOCATOR_LOCK:
+        if GEOLOCATOR is None:
+            from geopy.adapters import RequestsAdapter
+            from geopy.geocoders import Nominatim
+
+            GEOLOCATOR = Nominatim(
+                user_agent="Uber-Button",
+                timeout=60,
+                adapter_factory=RequestsAdapter,
+            )
+
+    return GEOLOCATOR
+
+# whether the last ride of this process reached 'completed', in which case
+# there is no current ride to cancel; unknown at startup
+_LAST_RIDE_COMPLETED = False
+
 
 def estimate_ride(api_client, start_lat, start_lng, end_lat, end_lng):
     """Use an UberRidesClient to fetch a ride estimate and print the results.
@@ -96,7 +165,7 @@ def estimate_ride(api_client, start_lat, start_lng, end_lat, end_lng):
         fail_print(error)
 
     else:
-        success_print(estimate.json)
+        log.debug('estimate: %s', estimate.json)
 
 
 def update_ride(api_client, ride_status, ride_id, verbose=True):
@@ -109,18 +178,23 @@ def update_ride(api_client, ride_status, ride_id, verbose=True):
             New ride status to update to.
         ride_id (str)
             Unique identifier for ride to update.
+
+    Returns
+        (bool)
+            True if the status was updated.
     """
     try:
         update_product = api_client.update_sandbox_ride(ride_id, ride_status)
 
     except (ClientError, ServerError) as error:
         fail_print(error)
+        return False
 
     else:
         if verbose:
-            message = '{} New status: {}'
-            message = message.format(update_product.status_code, ride_status)
-            success_print(message)
+            log.info(
+                '%s New status: %s', update_product.status_code, ride_status)
+        return True
 
 def request_ufp_ride(api_client, start_lat, start_lng, end_lat, end_lng):
     """Use an UberRidesClient to request a ride and print the results.
@@ -160,14 +234,18 @@ def request_ufp_ride(api_client, start_lat, start_lng, end_lat, end_lng):
         return
 
     else:
-        #success_print(estimate.json)
-        #success_print(request.json)
-
-        fare = estimate.json["fare"]["display"]
-        pickup_estimate = estimate.json["pickup_estimate"]
-        trip_duration_estimate = estimate.json["trip"]["duration_estimate"] / 60
-        paragraph_print("Die Fahrt wird vorraussichtlich %s kosten.\nDer Fahrer kann in %s Minuten da sein.\nDie Fahrdauer bis zum Ziel beträgt %s Minuten"
-                        % (fare, pickup_estimate, trip_duration_estimate))
+        estimate_json = estimate.json
+        log.debug('estimate: %s', estimate_json)
+        log.debug('request: %s', request.json)
+
+        fare = estimate_json["fare"]["display"]
+        pickup_estimate = estimate_json["pickup_estimate"]
+        trip_duration_estimate = estimate_json["trip"]["duration_estimate"] / 60
+        paragraph_print(
+            f"Die Fahrt wird vorraussichtlich {fare} kosten.\n"
+            f"Der Fahrer kann in {pickup_estimate} Minuten da sein.\n"
+            f"Die Fahrdauer bis zum Ziel beträgt {trip_duration_estimate} Minuten"
+        )
 
         return (request.json.get('request_id'), pickup_estimate, fare)
 
@@ -191,72 +269,199 @@ def get_ride_details(api_client, ride_id, verbose=True):
 
     else:
         if verbose:
-            success_print(ride_details.json)
+            log.info('ride details: %s', ride_details.json)
         return ride_details.json
 
 
 def get_latlng(location):
-    cache = FileCache('uber-button-cache')
+    """Look up the coordinates of an address.
+
+    Results are memoized in process first, then for 30 days in an on-disk
+    diskcache, so Nominatim is only queried for addresses not seen lately.
+    Unknown addresses are only remembered for the life of the process.
+
+    Parameters
+        location (str)
+            Address to geocode.
+
+    Returns
+        (Location)
+            The geocoded location, or None if the address is unknown.
+    """
+    global _LAST_GEOCODE
+
+    if location in _LATLNG_MEM:
+        return _LATLNG_MEM[location]
+
+    latlng = _GEO_CACHE.get(location, default=_MISSING)
+    if latlng is not _MISSING:
+        _LATLNG_MEM[location] = latlng
+        return latlng
+
+    # only wait out what is left of the interval since the last request
+    with _LAST_GEOCODE_LOCK:
+        if _LAST_GEOCODE is not None:
+            delay = GEOCODE_INTERVAL - (time.monotonic() - _LAST_GEOCODE)
+            if delay > 0:
+                time.sleep(delay)
 
-    if location not in cache:
-        geolocator = Nominatim(user_agent="Uber-Button")
-        geolocator.timeout = 60
-        time.sleep(1.1)
-        cache[location] = geolocator.geocode(location)
-        cache.sync()
+        _LAST_GEOCODE = time.monotonic()
 
-    return cache[location]
+    latlng = get_geolocator().geocode(location)
 
+    if latlng is not None:
+        _GEO_CACHE.set(location, latlng, expire=_GEO_CACHE_EXPIRE)
+    _LATLNG_MEM[location] = latlng
+    return latlng
 
-def on_button():
+
+def get_route():
+    """Geocode the start and end addresses concurrently.
+
+    Returns
+        (tuple)
+            The start and end locations, either may be None.
+    """
+    # both lookups are I/O bound, so let them overlap
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future_start = executor.submit(get_latlng, START_NAME)
+        future_end = executor.submit(get_latlng, END_NAME)
+        return future_start.result(), future_end.result()
+
+
+def resolve_route(start=None, end=None):
+    """Geocode whichever end of the route has no coordinates yet.
+
+    Parameters
+        start (Location)
+            Known pickup coordinates, or None to geocode START_NAME.
+        end (Location)
+            Known destination coordinates, or None to geocode END_NAME.
+
+    Returns
+        (tuple)
+            The start and end locations, either may be None.
+    """
+    if start is None and end is None:
+        return get_route()
+    if start is None:
+        start = get_latlng(START_NAME)
+    if end is None:
+        end = get_latlng(END_NAME)
+    return start, end
+
+
+def on_button(api_client=None):
     """Run the example.
 
-    Create an UberRidesClient from OAuth 2.0 Credentials, update a sandbox
-    product's surge, request and complete a ride.
+    Request a ride with an UberRidesClient and walk it through to
+    'completed' in the sandbox.
+
+    Parameters
+        api_client (UberRidesClient)
+            An authorized UberRidesClient with 'request' scope. Created
+            from the stored OAuth 2.0 Credentials if not given.
     """
-    credentials = import_oauth2_credentials()
-    api_client = create_uber_client(credentials)
+    global _LAST_RIDE_COMPLETED
+
+    if api_client is None:
+        credentials = import_oauth2_credentials()
+        api_client = create_uber_client(credentials)
 
     # ride request with upfront pricing flow
-    api_client.cancel_current_ride()
+    if not _LAST_RIDE_COMPLETED:
+        api_client.cancel_current_ride()
+        _LAST_RIDE_COMPLETED = True
 
     verbose = True
 
-    print("Frage Koordinaten ab...")
-
-    start = get_latlng(START_NAME)
-    end = get_latlng(END_NAME)
-
-    # Manually set coordinates
-    #UberLocation = namedtuple('UberLocation', 'latitude longitude')
-    #start = UberLocation(48, 11)
-    #end = UberLocation(48, 10)
+    start, end = START_COORDS, END_COORDS
+    if start is None or end is None:
+        print("Frage Koordinaten ab...")
+        start, end = resolve_route(start, end)
 
     if start is None:
         print("Bitte gültige Startadresse eingeben")
         return
     if end is None:
         print("Bitte gültige Endadresse eingeben")
+        return
 
-    print("Start (%s, %s)" % (start.latitude, start.longitude))
-    print("Ende (%s, %s)" % (end.latitude, end.longitude))
+    print(f"Start ({start.latitude}, {start.longitude})")
+    print(f"Ende ({end.latitude}, {end.longitude})")
 
     #Request a ride with upfront pricing product
-    paragraph_print("Anfrage einer Fahrt...\nVon: %s\nNach: %s" % (start, end))
-    ride_id, pickup_estimate, fare = request_ufp_ride(api_client, start.latitude, start.longitude, end.latitude, end.longitude)
+    paragraph_print(f"Anfrage einer Fahrt...\nVon: {start}\nNach: {end}")
+    ride = request_ufp_ride(api_client, start.latitude, start.longitude, end.latitude, end.longitude)
+    if ride is None:
+        return
+
+    ride_id, pickup_estimate, fare = ride
+    _LAST_RIDE_COMPLETED = False
+
+    # a single worker keeps the status updates in order while they
+    # overlap with the UI and the simulated drive
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        paragraph_print("Akzeptiere Fahrt...")
+        accepted = executor.submit(
+            update_ride, api_client, 'accepted', ride_id, verbose)
 
-    paragraph_print("Akzeptiere Fahrt...")
-    update_ride(api_client, 'accepted', ride_id, verbose=verbose)
+        paragraph_print("Warten bis Fahrer da ist...")
+        show_ui(pickup_estimate, fare)
 
-    paragraph_print("Warten bis Fahrer da ist...")
-    show_ui(pickup_estimate, fare)
+        paragraph_print("Einsteigen und losfahren...")
+        in_progress = executor.submit(
+            update_ride, api_client, 'in_progress', ride_id, verbose)
+        time.sleep(5)
 
-    paragraph_print("Einsteigen und losfahren...")
-    update_ride(api_client, 'in_progress', ride_id, verbose=verbose)
-    time.sleep(5)
+        paragraph_print("Am Ziel angekommen...")
+        completed = executor.submit(
+            update_ride, api_client, 'completed', ride_id, verbose)
 
-    paragraph_print("Am Ziel angekommen...")
-    update_ride(api_client, 'completed', ride_id, verbose=verbose)
+    # surface anything update_ride does not handle itself
+    accepted.result()
+    in_progress.result()
+    _LAST_RIDE_COMPLETED = completed.result()
+
+
+def parse_coords(value):
+    """Parse a 'LAT,LNG' command line value into an UberLocation.
+
+    Parameters
+        value (str)
+            Latitude and longitude separated by a comma.
+
+    Returns
+        (UberLocation)
+            The parsed coordinates.
+
+    Raises
+        ArgumentTypeError
+    """
+    try:
+        latitude, longitude = (float(part) for part in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'expected LAT,LNG, got {value!r}')
+
+    return UberLocation(latitude, longitude)
+
+
+def parse_args():
+    """Parse the command line into the route to request rides for."""
+    parser = argparse.ArgumentParser(
+        description='Request an Uber ride at the press of a button.')
+    parser.add_argument(
+        '--start', default=START_NAME, help='pickup address')
+    parser.add_argument(
+        '--end', default=END_NAME, help='destination address')
+    parser.add_argument(
+        '--start-coords', type=parse_coords, metavar='LAT,LNG',
+        help='pickup coordinates, skips geocoding the pickup address')
+    parser.add_argument(
+        '--end-coords', type=parse_coords, metavar='LAT,LNG',
+        help='destination coordinates, skips geocoding the destination')
+    return parser.parse_args()
 
 
 def init_gpio():
@@ -269,38 +474,67 @@ def init_gpio():
 def show_ui(eta, price):
     import PySimpleGUI as sg
     font = ("Helvetica", 50)
-    layout = [[sg.Text('Ankunft in: %s Minuten' % eta, font=font)],
-              [sg.Text('Preis: %s' % price, font=font)],
+
+    if not rpi:
+        # nothing but OK can close the window, a blocking popup will do
+        sg.popup_ok(
+            f'Ankunft in: {eta} Minuten\nPreis: {price}',
+            font=font,
+            title='UberButton',
+        )
+        return
+
+    layout = [[sg.Text(f'Ankunft in: {eta} Minuten', font=font)],
+              [sg.Text(f'Preis: {price}', font=font)],
               [sg.OK(font=font)]]
 
     # Create the Window
     window = sg.Window('UberButton', layout)
-    # Event Loop to process "events"
+    # Event Loop to process "events", the button can close the window too
     while True:
         event, values = window.Read(timeout=1000)
-        #print(event, values)
         if event in (None, 'OK'):
             break
-        elif rpi and GPIO.event_detected(10):
+        elif GPIO.event_detected(10):
             break
 
     window.Close()
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    args = parse_args()
+    START_NAME, END_NAME = args.start, args.end
+
+    # the route is fixed for the run, so keep geocoding off the button's
+    # hot path
+    START_COORDS, END_COORDS = resolve_route(
+        args.start_coords, args.end_coords)
+    if START_COORDS is None:
+        sys.exit("Bitte gültige Startadresse eingeben")
+    if END_COORDS is None:
+        sys.exit("Bitte gültige Endadresse eingeben")
+
+    # build the client once and share it between button presses
+    API_CLIENT = create_uber_client(import_oauth2_credentials())
+
     rpi = False
     try:
         import RPi.GPIO as GPIO
     except ImportError as e:
         print("Starte im Nicht-Raspberry-Pi Modus")
-        on_button("")
+        on_button(api_client=API_CLIENT)
     else:
         rpi = True
         print("Starte im Raspberry-Pi Modus")
         init_gpio()
-        while True:
-            if GPIO.event_detected(10):
-                on_button()
-            time.sleep(1)
-
-        GPIO.cleanup() # Clean up
\ No newline at end of file
+        try:
+            while True:
+                if GPIO.event_detected(10):
+                    on_button(api_client=API_CLIENT)
+                    # drop presses made while the ride was running
+                    GPIO.event_detected(10)
+                time.sleep(1)
+        finally:
+            GPIO.cleanup() # Clean up
\ No newline at end of file